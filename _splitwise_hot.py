@@ -0,0 +1,53 @@
+# _splitwise_hot.py
+"""Hot per-request helpers, isolated so they can be AOT-compiled.
+
+These are the only pure-Python functions on the request path that do
+real work (money math, payload building). Keeping them in their own
+fully-annotated module lets a build step run ``mypyc _splitwise_hot.py``
+to produce a C extension; when present, the compiled module shadows this
+file and the imports in splitwise_mcp pick it up with no code changes.
+Without the build step this plain-Python version is used.
+"""
+from typing import Any, Dict, List
+
+
+def to_cents(amount: float) -> int:
+    """Convert a float money amount to integer cents, rounding once."""
+    return int(round(amount * 100))
+
+
+def fmt_cents(cents: int) -> str:
+    """Format integer cents as the "12.34" string Splitwise expects.
+
+    The sign is handled explicitly: // and % floor toward negative
+    infinity, which would turn -150 into "-2.50".
+    """
+    sign = "-" if cents < 0 else ""
+    units, rem = divmod(abs(cents), 100)
+    return f"{sign}{units}.{rem:02d}"
+
+
+def build_expense_body(amount: float, currency: str, description: str,
+                       participants: List[Any]) -> Dict[str, Any]:
+    """Build the form-style create_expense payload Splitwise expects.
+
+    ``participants`` is any sequence of objects with user_id/share/paid
+    attributes. All money goes through integer cents; the total is
+    formatted once and each share exactly once.
+    """
+    amt = fmt_cents(to_cents(amount))
+    zero = "0.00"
+    body: Dict[str, Any] = {
+        "cost": amt,
+        "currency_code": currency,
+        "description": description,
+        "group_id": 0  # or allow as optional in intent if you want
+    }
+    body.update({
+        f"users__{idx}__{key}": value
+        for idx, part in enumerate(participants)
+        for key, value in (("user_id", part.user_id),
+                           ("owed_share", fmt_cents(to_cents(part.share))),
+                           ("paid_share", amt if part.paid else zero))
+    })
+    return body
@@ -22,51 +22,125 @@ Cursor IDE:
 from dotenv import load_dotenv
 load_dotenv()
 
-import json
+import asyncio
+import fastjsonschema
+import inspect
 import httpx
-from fastapi import FastAPI, HTTPException
+import msgspec
+import orjson
+import redis.asyncio as redis
+import xxhash
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.responses import JSONResponse
-from pydantic import BaseModel
-from typing import List, Optional, Any
+from typing import List, Optional
 import os
+import re
 
-# Load Splitwise OpenAPI spec (for future schema validation)
-with open('openapi.json') as f:
-    splitwise_spec = json.load(f)
+from _splitwise_hot import build_expense_body, fmt_cents, to_cents
+
+# Splitwise OpenAPI spec (for future schema validation), loaded lazily so
+# cold starts on serverless hosts don't pay the parse until it's needed.
+_spec_cache = None
+
+def get_spec():
+    global _spec_cache
+    if _spec_cache is None:
+        with open('openapi.json', 'rb') as f:
+            _spec_cache = orjson.loads(f.read())
+    return _spec_cache
+
+# Request validators compiled from the spec, one per (path, method).
+# Compiling happens once alongside the first spec load; per-request
+# validation is then a single call into fastjsonschema's generated code.
+_validator_cache = None
+
+def get_validators():
+    global _validator_cache
+    if _validator_cache is None:
+        spec = get_spec()
+        components = spec.get('components', {})
+        _validator_cache = {}
+        for path, ops in spec['paths'].items():
+            for method, op in ops.items():
+                if not isinstance(op, dict):
+                    continue
+                schema = (op.get('requestBody', {}).get('content', {})
+                          .get('application/json', {}).get('schema'))
+                if schema:
+                    # Merge components in so "#/components/..." refs resolve.
+                    _validator_cache[(path, method.upper())] = fastjsonschema.compile(
+                        {**schema, 'components': components})
+    return _validator_cache
 
 # Configuration via environment or hardcode for demo
 SPLITWISE_BASE = "https://secure.splitwise.com/api/v3.0"
 API_KEY = os.getenv('API_KEY', 'YOUR_SPLITWISE_API_KEY')
+# Built once; every request rides on this header via the pooled client.
+_AUTH = {"Authorization": f"Bearer {API_KEY}"}
 
-# ------------------ Pydantic Models ------------------
-class Participant(BaseModel):
+# Optional Redis cache for read endpoints; enabled by setting REDIS_URL.
+# Run the server with maxmemory-policy allkeys-lfu so hot keys survive.
+REDIS_URL = os.getenv('REDIS_URL')
+redis_client = redis.from_url(REDIS_URL, decode_responses=False) if REDIS_URL else None
+
+# How long each stale copy is kept around for the Splitwise-down fallback.
+STALE_TTL = 86400
+
+# ------------------ Request Models ------------------
+# msgspec Structs: decoded straight from the request bytes, far cheaper
+# than Pydantic model construction for a thin proxy like this.
+class Participant(msgspec.Struct):
     user_id: int
     share: float
     paid: bool
 
-class ExpenseIntent(BaseModel):
+class ExpenseIntent(msgspec.Struct):
     user_id: int
     amount: float
     currency: str
     description: str
     participants: List[Participant]
 
-class FriendIntent(BaseModel):
+class FriendIntent(msgspec.Struct):
     user_email: str
-    first_name: Optional[str]
-    last_name: Optional[str]
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
 
-class GroupIntent(BaseModel):
+class GroupIntent(msgspec.Struct):
     name: str
     group_type: Optional[str] = 'other'
     simplify_by_default: Optional[bool] = False
     users: Optional[List[int]] = []
 
-class MCPResponse(BaseModel):
-    status: str
-    data: Any
+# One decoder per model, built at import time so request handling is a
+# single .decode() call with no per-request decoder setup.
+EXPENSE_DECODER = msgspec.json.Decoder(ExpenseIntent)
+FRIEND_DECODER = msgspec.json.Decoder(FriendIntent)
+GROUP_DECODER = msgspec.json.Decoder(GroupIntent)
+
+# Shared HTTP client: one pooled connection set for the whole app lifetime,
+# so each call reuses a keep-alive socket instead of paying TCP+TLS setup.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.http = httpx.AsyncClient(
+        base_url=SPLITWISE_BASE,
+        headers=_AUTH,
+        http2=True,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        timeout=30.0,
+    )
+    yield
+    await app.state.http.aclose()
+
+app = FastAPI(title="Splitwise MCP Service", lifespan=lifespan)
 
-app = FastAPI(title="Splitwise MCP Service")
+# msgspec raises its own error types; surface them as a standard 422.
+# DecodeError covers malformed JSON as well as its ValidationError
+# subclass for well-formed bodies that fail type checks.
+@app.exception_handler(msgspec.DecodeError)
+async def msgspec_validation_error(request: Request, exc: msgspec.DecodeError):
+    return JSONResponse(status_code=422, content={"detail": str(exc)})
 
 # ✅ Add root route for Render health check
 @app.get("/", include_in_schema=False)
@@ -74,14 +148,77 @@ async def root():
     return {"status": "Splitwise MCP is running"}
 
 # ------------------ Helper ------------------
-async def call_splitwise(method: str, path: str, payload: dict = None, params: dict = None):
-    headers = {"Authorization": f"Bearer {API_KEY}"}
-    url = f"{SPLITWISE_BASE}{path}"
-    async with httpx.AsyncClient() as client:
-        response = await client.request(method, url, json=payload, params=params, headers=headers)
-        if response.status_code not in (200, 201):
-            raise HTTPException(status_code=response.status_code, detail=response.text)
-        return response.json()
+async def call_splitwise(method: str, path: str, payload: dict = None, params: dict = None,
+                         validate: bool = False):
+    if validate and payload is not None:
+        validator = get_validators().get((path, method))
+        if validator is not None:
+            try:
+                validator(payload)
+            except fastjsonschema.JsonSchemaValueException as exc:
+                raise HTTPException(status_code=422, detail=exc.message)
+    response = await app.state.http.request(method, path, json=payload, params=params)
+    if response.status_code not in (200, 201):
+        raise HTTPException(status_code=response.status_code, detail=response.text)
+    return response.json()
+
+async def call_splitwise_many(reqs: list) -> list:
+    """Issue several Splitwise calls concurrently.
+
+    Takes (method, path, params) tuples and returns the parsed responses
+    in the same order. All calls share the pooled client, so total
+    latency is the slowest round trip rather than the sum.
+    """
+    return list(await asyncio.gather(
+        *(call_splitwise(method, path, params=params) for method, path, params in reqs)))
+
+async def call_splitwise_raw(method: str, path: str, payload: dict = None, params: dict = None) -> bytes:
+    """Like call_splitwise, but returns the upstream JSON bytes unparsed."""
+    response = await app.state.http.request(method, path, json=payload, params=params)
+    if response.status_code not in (200, 201):
+        raise HTTPException(status_code=response.status_code, detail=response.text)
+    return response.content
+
+async def cached_call_raw(key: str, ttl: int, method: str, path: str, params: dict = None) -> bytes:
+    """call_splitwise_raw with a Redis byte cache in front.
+
+    Cache hits skip Splitwise (and any JSON work) entirely. On upstream
+    failure the last stale copy is served instead, if one exists.
+    """
+    if redis_client is None:
+        return await call_splitwise_raw(method, path, params=params)
+    cached = await redis_client.get(key)
+    if cached is not None:
+        return cached
+    try:
+        raw = await call_splitwise_raw(method, path, params=params)
+    except (httpx.HTTPError, HTTPException) as exc:
+        # Only fall back when Splitwise is unreachable or failing (transport
+        # errors, 5xx). Client errors like a revoked key or a deleted
+        # resource must surface, not be masked by a day-old copy.
+        if isinstance(exc, HTTPException) and exc.status_code < 500:
+            raise
+        stale = await redis_client.get(f"stale:{key}")
+        if stale is not None:
+            return stale
+        raise
+    await redis_client.set(key, raw, ex=ttl)
+    await redis_client.set(f"stale:{key}", raw, ex=STALE_TTL)
+    return raw
+
+def passthrough_response(raw: bytes, request: Request = None) -> Response:
+    # Splice the upstream bytes into the envelope so read endpoints skip
+    # the JSON decode + re-encode round trip entirely.
+    body = b'{"status":"success","data":' + raw + b'}'
+    if request is None:
+        return Response(content=body, media_type="application/json")
+    # Conditional GET: xxh3 is effectively free on KB-sized payloads, and
+    # polling agents that send If-None-Match get a bodyless 304 back.
+    etag = f'"{xxhash.xxh3_64_hexdigest(body)}"'
+    if request.headers.get('if-none-match') == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json",
+                    headers={"ETag": etag, "Cache-Control": "private, max-age=10"})
 
 # ------------------ Expense Endpoints ------------------
 # Example usage for /mcp/create_expense:
@@ -117,45 +254,41 @@ async def call_splitwise(method: str, path: str, payload: dict = None, params: d
 #   "split_type": "shares",
 #   "owed_shares": [50, 30, 20]
 # }
-@app.post('/mcp/create_expense', response_model=MCPResponse)
-async def mcp_create_expense(intent: ExpenseIntent):
-    body = {
-        "cost": f"{intent.amount:.2f}",
-        "currency_code": intent.currency,
-        "description": intent.description,
-        "group_id": 0  # or allow as optional in intent if you want
-    }
-    for idx, part in enumerate(intent.participants):
-        body[f"users__{idx}__user_id"] = part.user_id
-        body[f"users__{idx}__owed_share"] = f"{part.share:.2f}"
-        body[f"users__{idx}__paid_share"] = f"{intent.amount:.2f}" if part.paid else "0.00"
-
+@app.post('/mcp/create_expense')
+async def mcp_create_expense(request: Request):
+    intent = EXPENSE_DECODER.decode(await request.body())
+    body = build_expense_body(intent.amount, intent.currency, intent.description,
+                              intent.participants)
     api_resp = await call_splitwise('POST', '/create_expense', payload=body)
     return {"status": "success", "data": api_resp}
 
-@app.get('/mcp/list_expenses', response_model=MCPResponse)
-async def mcp_list_expenses(user_id: Optional[int] = None, group_id: Optional[int] = None):
+@app.get('/mcp/list_expenses')
+async def mcp_list_expenses(request: Request, user_id: Optional[int] = None,
+                            group_id: Optional[int] = None):
     params = {}
     if group_id:
         params['group_id'] = group_id
     elif user_id:
         params['friend_id'] = user_id
-    api_resp = await call_splitwise('GET', '/get_expenses', params=params)
-    return {"status": "success", "data": api_resp}
-
-@app.get('/mcp/get_expense/{expense_id}', response_model=MCPResponse)
-async def mcp_get_expense(expense_id: int):
-    api_resp = await call_splitwise('GET', f'/get_expense/{expense_id}')
-    return {"status": "success", "data": api_resp}
+    key = f"expenses:{group_id or ''}:{user_id or ''}"
+    raw = await cached_call_raw(key, 15, 'GET', '/get_expenses', params=params)
+    return passthrough_response(raw, request)
 
-@app.get('/mcp/get_balance/{user_id}', response_model=MCPResponse)
+@app.get('/mcp/get_balance/{user_id}')
 async def mcp_get_balance(user_id: int):
-    api_resp = await call_splitwise('GET', '/get_current_user')
-    return {"status": "success", "data": api_resp}
+    # User and group balances come from separate Splitwise calls; fetch
+    # both at once so latency is one round trip, not two.
+    user_raw, groups_raw = await asyncio.gather(
+        cached_call_raw(f"balance:{user_id}", 10, 'GET', '/get_current_user'),
+        cached_call_raw("groups", 30, 'GET', '/get_groups'))
+    return Response(content=(b'{"status":"success","data":{"user":' + user_raw
+                             + b',"groups":' + groups_raw + b'}}'),
+                    media_type="application/json")
 
 # ------------------ Group Endpoints ------------------
-@app.post('/mcp/create_group', response_model=MCPResponse)
-async def mcp_create_group(intent: GroupIntent):
+@app.post('/mcp/create_group')
+async def mcp_create_group(request: Request):
+    intent = GROUP_DECODER.decode(await request.body())
     body = {"name": intent.name,
             "group_type": intent.group_type,
             "simplify_by_default": intent.simplify_by_default}
@@ -164,29 +297,10 @@ async def mcp_create_group(intent: GroupIntent):
     api_resp = await call_splitwise('POST', '/create_group', payload=body)
     return {"status": "success", "data": api_resp}
 
-@app.post('/mcp/delete_group/{group_id}', response_model=MCPResponse)
-async def mcp_delete_group(group_id: int):
-    api_resp = await call_splitwise('POST', f'/delete_group/{group_id}')
-    return {"status": "success", "data": api_resp}
-
-@app.get('/mcp/list_groups', response_model=MCPResponse)
-async def mcp_list_groups():
-    api_resp = await call_splitwise('GET', '/get_groups')
-    return {"status": "success", "data": api_resp}
-
-@app.get('/mcp/get_group/{group_id}', response_model=MCPResponse)
-async def mcp_get_group(group_id: int):
-    api_resp = await call_splitwise('GET', f'/get_group/{group_id}')
-    return {"status": "success", "data": api_resp}
-
 # ------------------ Friend Endpoints ------------------
-@app.get('/mcp/list_friends', response_model=MCPResponse)
-async def mcp_list_friends():
-    api_resp = await call_splitwise('GET', '/get_friends')
-    return {"status": "success", "data": api_resp}
-
-@app.post('/mcp/add_friend', response_model=MCPResponse)
-async def mcp_add_friend(intent: FriendIntent):
+@app.post('/mcp/add_friend')
+async def mcp_add_friend(request: Request):
+    intent = FRIEND_DECODER.decode(await request.body())
     body = {"user_email": intent.user_email}
     if intent.first_name:
         body['user_first_name'] = intent.first_name
@@ -195,12 +309,57 @@ async def mcp_add_friend(intent: FriendIntent):
     api_resp = await call_splitwise('POST', '/create_friend', payload=body)
     return {"status": "success", "data": api_resp}
 
-@app.post('/mcp/delete_friend/{friend_id}', response_model=MCPResponse)
-async def mcp_delete_friend(friend_id: int):
-    api_resp = await call_splitwise('POST', f'/delete_friend/{friend_id}')
-    return {"status": "success", "data": api_resp}
+# ------------------ Passthrough Endpoints ------------------
+# One-call proxy routes share a single generated handler instead of ten
+# near-identical async defs: (method, mount, upstream, cache key, ttl).
+# A ttl of None means always go upstream (writes must not be cached).
+PROXY_ROUTES = [
+    ('GET', '/mcp/list_groups', '/get_groups', 'groups', 30),
+    ('GET', '/mcp/get_group/{group_id}', '/get_group/{group_id}', 'group:{group_id}', 15),
+    ('GET', '/mcp/get_expense/{expense_id}', '/get_expense/{expense_id}', 'expense:{expense_id}', 30),
+    ('GET', '/mcp/list_friends', '/get_friends', 'friends', 60),
+    ('POST', '/mcp/delete_group/{group_id}', '/delete_group/{group_id}', None, None),
+    ('POST', '/mcp/delete_friend/{friend_id}', '/delete_friend/{friend_id}', None, None),
+]
+
+def make_proxy_handler(http_method: str, upstream: str, cache_key: str, ttl: int,
+                       path_param: str = None):
+    async def handler(**path_params):
+        request = path_params.pop('request')
+        path = upstream.format(**path_params) if path_params else upstream
+        if ttl is None:
+            raw = await call_splitwise_raw(http_method, path)
+            return passthrough_response(raw)
+        key = cache_key.format(**path_params) if path_params else cache_key
+        raw = await cached_call_raw(key, ttl, http_method, path)
+        # Only the cached GETs are worth serving conditionally.
+        return passthrough_response(raw, request)
+    # FastAPI builds the route from the signature, so expose the path
+    # parameter (if any) as a typed argument there.
+    params = [inspect.Parameter('request', inspect.Parameter.POSITIONAL_OR_KEYWORD,
+                                annotation=Request)]
+    if path_param is not None:
+        params.append(inspect.Parameter(path_param, inspect.Parameter.POSITIONAL_OR_KEYWORD,
+                                        annotation=int))
+    handler.__signature__ = inspect.Signature(params)
+    return handler
+
+for _method, _mount, _upstream, _key, _ttl in PROXY_ROUTES:
+    _path_params = re.findall(r'{(\w+)}', _mount)
+    app.add_api_route(
+        _mount,
+        make_proxy_handler(_method, _upstream, _key, _ttl,
+                           _path_params[0] if _path_params else None),
+        methods=[_method],
+        name=f"mcp_{_upstream.strip('/').split('/')[0]}")
 
 # ------------------ Run ------------------
 if __name__ == '__main__':
     import uvicorn
-    uvicorn.run(app, host='0.0.0.0', port=8000)
+    # uvloop + httptools aren't auto-selected on every platform; ask for
+    # them explicitly, and run one worker per core (each gets its own
+    # event loop and pooled httpx client via the lifespan above).
+    uvicorn.run("splitwise_mcp:app", host='0.0.0.0', port=8000,
+                loop='uvloop', http='httptools',
+                workers=int(os.getenv('WEB_CONCURRENCY', os.cpu_count() or 2)),
+                log_level='warning')